@@ -4,11 +4,20 @@ import pathlib
 import shutil
 import sys
 
-import colorama
-
 from . import gwm
 
 
+#: Maximum number of threads used for copying files in parallel.
+_MAX_COPY_WORKERS = 16
+
+
+def _copy_file(op):
+    """Execute the given copy operation and return it."""
+    src, dest = op
+    shutil.copyfile(src, dest)
+    return op
+
+
 def cmd_list_workflows(args):
     """List workflows from the given manifest file."""
     workflows, _ = gwm.load_workflows(args.workflows)
@@ -38,23 +47,33 @@ def cmd_put(args):
     ops = gwm.determine_operations(repos, workflows_per_language)
 
     if args.dry_run:
+        colorama = gwm.init_colorama()
         print(colorama.Fore.YELLOW + "Dry run, not actually copying files.")
         for op in ops:
             print("Copy {} -> {}".format(*op))
     else:
-        for src, dest in ops:
-            # make sure the target directory exists
-            dest.parent.mkdir(parents=True, exist_ok=True)
-            shutil.copyfile(src, dest)
-            if args.verbose:
-                print("Copy {} -> {}".format(src, dest))
+        # imported here, as it is comparatively slow to import and only needed when
+        # actually copying files
+        import concurrent.futures
+
+        # make sure the target directories exist
+        for target_dir in {dest.parent for _, dest in ops}:
+            target_dir.mkdir(parents=True, exist_ok=True)
+
+        # Several operations may target the same physical file (e.g. if a repository
+        # in the workspace is a symlink to another one).  They always copy the same
+        # source file, so writing it concurrently still gives the correct result.
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=_MAX_COPY_WORKERS
+        ) as executor:
+            for src, dest in executor.map(_copy_file, ops):
+                if args.verbose:
+                    print("Copy {} -> {}".format(src, dest))
 
     return 0
 
 
 def main():
-    colorama.init(autoreset=True)
-
     parser = argparse.ArgumentParser(description=__doc__)
     subparsers = parser.add_subparsers(title="commands", dest="command")
     subparsers.required = True
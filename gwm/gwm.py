@@ -1,12 +1,10 @@
 """Distribute GitHub Workflows to a whole workspace of repositories."""
 import collections
+import os
 import pathlib
 import sys
 import typing
 
-import colorama
-import tomli
-
 
 DEFAULT_ACTIONS_TOML = "actions.toml"
 
@@ -18,12 +16,28 @@ LANGUAGES = {
     "lua": [".lua"],
 }
 
+#: Reverse lookup table of LANGUAGES, mapping file extensions to language names.
+_EXT_TO_LANG: typing.Dict[str, str] = {
+    ext: lang for lang, exts in LANGUAGES.items() for ext in exts
+}
+
 
 _WORKFLOW_PATH = ".github/workflows"
 
+#: Directories which are skipped when scanning a repository for source files.  All
+#: hidden directories (e.g. .git, .venv, .tox) are skipped as well, so only names not
+#: starting with a dot need to be listed here.
+_PRUNE_DIRS = frozenset(("node_modules", "__pycache__", "venv", "build", "dist"))
+
+#: Maximum number of threads used for scanning repositories in parallel.
+_MAX_SCAN_WORKERS = 32
+
 _MANIFEST_KEY_FILE = "file"
 _MANIFEST_KEY_LANGUAGE = "language"
 
+# colorama is only imported and initialised when a coloured message is printed
+_colorama_ready = False
+
 
 class Workflow(typing.NamedTuple):
     """Metadata of a workflow."""
@@ -37,10 +51,17 @@ class Workflow(typing.NamedTuple):
     #: Programming languages for which the workflow is relevant.
     languages: typing.List[str]
 
-    def validate(self):
-        """Validate if the workflow information is sane, raise error if not."""
+    def validate(self, existing_files: typing.Optional[typing.AbstractSet[str]] = None):
+        """Validate if the workflow information is sane, raise error if not.
+
+        Args:
+            existing_files: Optional set of names of the files in :attr:`parent_dir`.
+                Files listed there are not checked again on the file system.
+        """
         # check if all specified files do actually exist
         for file in self.files:
+            if existing_files is not None and file in existing_files:
+                continue
             if not (self.parent_dir / file).is_file():
                 raise FileNotFoundError(file)
 
@@ -56,12 +77,28 @@ class Repository(typing.NamedTuple):
     workflows: typing.List[str]
 
 
+def init_colorama():
+    """Import and initialise colorama on first use.
+
+    Returns:
+        The colorama module.
+    """
+    global _colorama_ready
+
+    import colorama
+
+    if not _colorama_ready:
+        colorama.init(autoreset=True)
+        _colorama_ready = True
+
+    return colorama
+
+
 def as_list(x: typing.Any):
     """If x is a list, return x, else return [x]."""
-    if not isinstance(x, list):
-        return [x]
-    else:
-        return x
+    # Exact type check instead of isinstance(), the TOML parser only returns plain
+    # lists.  Note that this wraps instances of list subclasses.
+    return x if type(x) is list else [x]
 
 
 def print_table(data: typing.List[typing.Sequence[str]], header=None):
@@ -76,23 +113,38 @@ def print_table(data: typing.List[typing.Sequence[str]], header=None):
     if header:
         data = [header] + data
 
-    max_lengths = [len(x) for x in data[0]]
-    for row in data[1:]:
-        lengths = [len(x) for x in row]
-        max_lengths = [max(x, y) for x, y in zip(max_lengths, lengths)]
+    if not data:
+        return
 
-    fmt_str = " | ".join("{:<%ds}" % length for length in max_lengths)
+    max_lengths = [max(map(len, col)) for col in zip(*data)]
 
-    for row in data:
-        print(fmt_str.format(*row))
+    # pad the cells with str.ljust instead of going through str.format and write the
+    # whole table at once instead of printing row by row
+    sys.stdout.write(
+        "".join(
+            " | ".join(cell.ljust(n) for cell, n in zip(row, max_lengths)) + "\n"
+            for row in data
+        )
+    )
 
 
 def load_workflows(
     manifest_file: pathlib.Path,
 ) -> typing.Tuple[typing.List[Workflow], typing.Dict[str, typing.List[Workflow]]]:
     """Load workflow metadata from the specified manifest file."""
+    # only import the TOML parser when a manifest is actually loaded
+    if sys.version_info >= (3, 11):
+        import tomllib
+    else:
+        import tomli as tomllib
+
     with open(manifest_file, "rb") as f:
-        manifest = tomli.load(f)
+        manifest = tomllib.load(f)
+
+    # list the manifest directory once, so the workflows do not need to check each of
+    # their files separately
+    with os.scandir(manifest_file.parent) as it:
+        existing_files = {e.name for e in it if e.is_file()}
 
     workflows: typing.List[Workflow] = []
     workflows_per_language = collections.defaultdict(list)
@@ -113,8 +165,9 @@ def load_workflows(
                 info[_MANIFEST_KEY_FILE],
                 info[_MANIFEST_KEY_LANGUAGE],
             )
-            wf.validate()
+            wf.validate(existing_files)
         except Exception as e:
+            colorama = init_colorama()
             print(
                 colorama.Fore.YELLOW
                 + "Ignore invalid workflow {}.  Reason: {}".format(name, e),
@@ -129,30 +182,75 @@ def load_workflows(
     return workflows, workflows_per_language
 
 
-def determine_language(dir_path: pathlib.Path):
-    """Determine programming languages used in the specified directory.
+def _walk_entries(
+    entries: typing.Iterable["os.DirEntry[str]"],
+) -> typing.Iterator["os.DirEntry[str]"]:
+    """Yield the files among the given entries and recursively below the directories.
 
-    Scans the given directory recursively for files and tries to detect programming
-    languages based on file extensions.  See LANGUAGES.
+    Symbolic links to directories are not followed.  Hidden directories and those
+    listed in :data:`_PRUNE_DIRS` are not descended into.
     """
-    check_langs = LANGUAGES.copy()
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            if entry.name in _PRUNE_DIRS or entry.name.startswith("."):
+                continue
+            yield from _scandir_recursive(entry.path)
+        elif entry.is_file():
+            yield entry
+
+
+def _scandir_recursive(
+    path: typing.Union[str, pathlib.Path],
+) -> typing.Iterator["os.DirEntry[str]"]:
+    """Recursively yield all files below the given directory.
+
+    Uses :func:`os.scandir`, so the file type information cached in the directory
+    entries is used instead of calling ``stat()`` on each path.  Paths that cannot be
+    listed (missing, not a directory, no permission) are skipped.  See
+    :func:`_walk_entries` for which directories are descended into.
+    """
+    try:
+        with os.scandir(os.fspath(path)) as it:
+            yield from _walk_entries(it)
+    except OSError:
+        pass
+
+
+def _detect_languages(files: typing.Iterable["os.DirEntry[str]"]) -> typing.List[str]:
+    """Detect programming languages based on the extensions of the given files."""
+    remaining = set(LANGUAGES)
     detected_languages: typing.List[str] = []
 
-    for file in (x for x in dir_path.rglob("*") if x.is_file()):
-        # stop if there are no more languages to be checked
-        if not check_langs:
-            break
+    for entry in files:
+        # extract the suffix inline, this loop runs for every file in the repository.
+        # Like pathlib, leading dots (hidden files) do not start a suffix.
+        name = entry.name
+        dot = name.rfind(".")
+        if dot <= 0:
+            continue
+        lang = _EXT_TO_LANG.get(name[dot:])
+        if lang in remaining:
+            detected_languages.append(lang)
+            # once a language is detected, remove it from the set (no need to check
+            # for this language again)
+            remaining.discard(lang)
 
-        for lang in list(check_langs.keys()):
-            if file.suffix in check_langs[lang]:
-                detected_languages.append(lang)
-                # once a language is detected, remove it from the list (no need
-                # to check for this language again)
-                del check_langs[lang]
+            # stop walking the directory as soon as all languages are found
+            if not remaining:
+                break
 
     return detected_languages
 
 
+def determine_language(dir_path: pathlib.Path):
+    """Determine programming languages used in the specified directory.
+
+    Scans the given directory recursively for files and tries to detect programming
+    languages based on file extensions.  See LANGUAGES.
+    """
+    return _detect_languages(_scandir_recursive(dir_path))
+
+
 def find_existing_workflows(repo_dir: pathlib.Path) -> typing.List[str]:
     """Find existing workflows in the given repository.
 
@@ -162,22 +260,46 @@ def find_existing_workflows(repo_dir: pathlib.Path) -> typing.List[str]:
     Returns:
         List of workflow files that are found in the repository.
     """
-    workflow_dir = repo_dir / _WORKFLOW_PATH
-    if workflow_dir.is_dir():
-        workflows = [
-            f.name for f in workflow_dir.iterdir() if f.is_file() and f.suffix == ".yml"
-        ]
-    else:
-        workflows = []
+    workflow_dir = os.path.join(repo_dir, _WORKFLOW_PATH)
+    if not os.path.isdir(workflow_dir):
+        return []
+
+    with os.scandir(workflow_dir) as it:
+        workflows = [e.name for e in it if e.is_file() and e.name.endswith(".yml")]
 
     return workflows
 
 
+def _scan_repository(repo_dir: pathlib.Path) -> Repository:
+    """Collect the metadata of the repository in the given directory.
+
+    The top-level directory is listed only once and used both for the language
+    detection and to check whether there is a .github directory at all.
+    """
+    try:
+        with os.scandir(repo_dir) as it:
+            top_level = list(it)
+    except OSError:
+        top_level = []
+
+    langs = _detect_languages(_walk_entries(top_level))
+
+    if any(e.name == ".github" and e.is_dir() for e in top_level):
+        existing_workflows = find_existing_workflows(repo_dir)
+    else:
+        existing_workflows = []
+
+    return Repository(repo_dir, languages=langs, workflows=existing_workflows)
+
+
 def find_repositories(
     base_dir: pathlib.Path, ignore: typing.Sequence[str] = []
 ) -> typing.List[Repository]:
     """Get list of repositories in the given base directory.
 
+    The repositories are scanned in parallel using a thread pool.  Directories that
+    are reached via several paths (e.g. symlinks) are only scanned once.
+
     Args:
         base_dir: Directory that contains the repositories.
         ignore: Optional list of repository names that are ignored.
@@ -185,16 +307,48 @@ def find_repositories(
     Returns:
         List of repositories.
     """
-    repos = []
-    for dir in (x for x in base_dir.iterdir() if x.is_dir()):
-        if dir.name in ignore:
-            # skip repo if it is on the ignore list
-            continue
+    ignore_set = set(ignore)
+    dirs: typing.List[typing.Tuple[pathlib.Path, typing.Hashable]] = []
+    with os.scandir(base_dir) as it:
+        for e in it:
+            # skip repos that are on the ignore list
+            if not e.is_dir() or e.name in ignore_set:
+                continue
+
+            # identify the directory by device and inode, so that different paths
+            # to the same directory are detected
+            key: typing.Hashable
+            try:
+                st = e.stat()
+                key = (st.st_dev, st.st_ino)
+            except OSError:
+                key = e.path
+            dirs.append((base_dir / e.name, key))
+    if not dirs:
+        return []
+
+    unique_dirs: typing.Dict[typing.Hashable, pathlib.Path] = {}
+    for repo_dir, key in dirs:
+        unique_dirs.setdefault(key, repo_dir)
+
+    # imported here, as it is comparatively slow to import and not needed by all
+    # commands
+    import concurrent.futures
+
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=min(_MAX_SCAN_WORKERS, len(unique_dirs))
+    ) as executor:
+        scanned = dict(
+            zip(unique_dirs, executor.map(_scan_repository, unique_dirs.values()))
+        )
 
-        langs = determine_language(dir)
-        existing_workflows = find_existing_workflows(dir)
-
-        repos.append(Repository(dir, languages=langs, workflows=existing_workflows))
+    repos = []
+    for repo_dir, key in dirs:
+        repo = scanned[key]
+        if repo.path != repo_dir:
+            # same directory as another repository, reuse the scan results
+            repo = Repository(repo_dir, list(repo.languages), list(repo.workflows))
+        repos.append(repo)
 
     return repos
 
@@ -214,17 +368,23 @@ def determine_operations(
             of workflows.
 
     Returns:
-        List of "copy operation tuples" where the first element is the source file and
-        the second the destination.
+        Sorted list of unique "copy operation tuples" where the first element is the
+        source file and the second the destination.
     """
-    operations = []
+    # source paths only depend on the workflow, so resolve them once instead of for
+    # every repository
+    sources_per_language = {
+        lang: [(wf.parent_dir / wf_file, wf_file) for wf in wfs for wf_file in wf.files]
+        for lang, wfs in workflows_per_language.items()
+    }
+
+    # use a set, as a workflow may be registered for several languages matching the
+    # same repository
+    operations: typing.Set[typing.Tuple[pathlib.Path, pathlib.Path]] = set()
     for repo in repositories:
-        for lang in (
-            lang for lang in workflows_per_language if lang in repo.languages + ["*"]
-        ):
-            for wf in workflows_per_language[lang]:
-                for wf_file in wf.files:
-                    op = (wf.parent_dir / wf_file, repo.path / _WORKFLOW_PATH / wf_file)
-                    operations.append(op)
-
-    return operations
+        repo_wf_dir = repo.path / _WORKFLOW_PATH
+        for lang in (*repo.languages, "*"):
+            for src, wf_file in sources_per_language.get(lang, ()):
+                operations.add((src, repo_wf_dir / wf_file))
+
+    return sorted(operations)
@@ -1,6 +1,10 @@
 """Unit tests for github_workflow_manager (gwm)."""
 import collections
+import copy
 import pathlib
+import pickle
+import subprocess
+import sys
 
 import pytest
 
@@ -43,11 +47,57 @@ def workspace(tmp_path: pathlib.Path):
     return tmp_path
 
 
+def test_lazy_imports():
+    # importing the CLI must not load modules that are only needed by some commands
+    lazy_modules = ["colorama", "tomli", "tomllib", "concurrent.futures"]
+    code = "import sys, gwm.__main__; print([m for m in {} if m in sys.modules])"
+    result = subprocess.run(
+        [sys.executable, "-c", code.format(lazy_modules)],
+        cwd=pathlib.Path(__file__).parent.parent,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    assert result.stdout.strip() == "[]"
+
+
 def test_as_list():
     assert gwm.as_list(42) == [42]
     assert gwm.as_list([42]) == [42]
 
 
+def test_print_table(capsys):
+    gwm.print_table([("foo", "1"), ("foobar", "12")], header=["NAME", "N"])
+
+    assert capsys.readouterr().out.splitlines() == [
+        "NAME   | N ",
+        "foo    | 1 ",
+        "foobar | 12",
+    ]
+
+
+def test_workflow_validate():
+    wf = gwm.Workflow("test", workflows_dir, ["git.yml", "flake8.yml"], ["*"])
+    wf.validate()
+    wf.validate({"git.yml"})
+
+    wf = gwm.Workflow("test", workflows_dir, ["git.yml", "doesnotexist.yml"], ["*"])
+    with pytest.raises(FileNotFoundError):
+        wf.validate()
+    with pytest.raises(FileNotFoundError):
+        wf.validate({"git.yml"})
+
+
+def test_copy_and_pickle():
+    wf = gwm.Workflow("test", workflows_dir, ["git.yml"], ["*"])
+    repo = gwm.Repository(pathlib.Path("repo"), ["python"], ["git.yml"])
+
+    for obj in (wf, repo):
+        assert copy.copy(obj) == obj
+        assert copy.deepcopy(obj) == obj
+        assert pickle.loads(pickle.dumps(obj)) == obj
+
+
 def test_load_workflows():
     workflows, wf_per_lang = gwm.load_workflows(workflows_manifest)
 
@@ -77,6 +127,36 @@ def test_determine_language(workspace):
     assert sorted(gwm.determine_language(workspace / "py_cpp_pkg")) == ["c++", "python"]
 
 
+def test_determine_language_nested(tmp_path):
+    (tmp_path / "src/deep/er").mkdir(parents=True)
+    (tmp_path / "src/deep/er/module.lua").touch()
+    # files without a proper suffix are not considered
+    (tmp_path / ".py").touch()
+    (tmp_path / "src/cpp").touch()
+
+    assert gwm.determine_language(tmp_path) == ["lua"]
+
+
+def test_determine_language_invalid_path(tmp_path):
+    (tmp_path / "file.py").touch()
+
+    assert gwm.determine_language(tmp_path / "doesnotexist") == []
+    assert gwm.determine_language(tmp_path / "file.py") == []
+
+
+def test_determine_language_pruned_dirs(tmp_path):
+    (tmp_path / ".git/hooks").mkdir(parents=True)
+    (tmp_path / ".git/hooks/hook.py").touch()
+    (tmp_path / ".hidden").mkdir()
+    (tmp_path / ".hidden/main.cpp").touch()
+    (tmp_path / "build").mkdir()
+    (tmp_path / "build/README.md").touch()
+    (tmp_path / "doc").mkdir()
+    (tmp_path / "doc/index.rst").touch()
+
+    assert gwm.determine_language(tmp_path) == ["rst"]
+
+
 def test_find_existing_workflows(workspace):
     assert gwm.find_existing_workflows(workspace / "empty_pkg") == []
     assert sorted(gwm.find_existing_workflows(workspace / "py_pkg")) == [
@@ -127,6 +207,43 @@ def test_find_repositories_ignore_some(workspace):
     assert repos[1].workflows == []
 
 
+def test_find_repositories_symlink(workspace, monkeypatch):
+    (workspace / "py_link").symlink_to(workspace / "py_pkg")
+
+    scanned = []
+    scan_repository = gwm._scan_repository
+
+    def counting_scan(repo_dir):
+        scanned.append(repo_dir)
+        return scan_repository(repo_dir)
+
+    monkeypatch.setattr(gwm, "_scan_repository", counting_scan)
+    repos = gwm.find_repositories(workspace, ignore=["empty_pkg", "cpp_pkg"])
+    repos = sorted(repos, key=lambda r: r.path.name)
+
+    # py_link and py_pkg are the same directory, so it is only scanned once
+    assert len(scanned) == 2
+
+    assert [r.path.name for r in repos] == ["py_cpp_pkg", "py_link", "py_pkg"]
+    assert repos[1].path == workspace / "py_link"
+    assert repos[1].languages == repos[2].languages == ["python"]
+    assert sorted(repos[1].workflows) == ["exists1.yml", "exists2.yml"]
+
+
+def test_find_repositories_not_cached(workspace):
+    repos = gwm.find_repositories(workspace, ignore=["py_cpp_pkg", "py_pkg"])
+    assert sorted(r.path.name for r in repos if r.languages) == ["cpp_pkg"]
+
+    # changes are picked up by the next call
+    (workspace / "empty_pkg/file.py").touch()
+    repos = gwm.find_repositories(workspace, ignore=["py_cpp_pkg", "py_pkg"])
+    assert sorted(r.path.name for r in repos if r.languages) == ["cpp_pkg", "empty_pkg"]
+
+
+def test_find_repositories_empty(tmp_path):
+    assert gwm.find_repositories(tmp_path) == []
+
+
 def test_determine_operations(workspace):
     repos = gwm.find_repositories(workspace, ignore=["py_cpp_pkg"])
     _, wf_per_lang = gwm.load_workflows(workflows_manifest)
@@ -156,7 +273,17 @@ def test_determine_operations(workspace):
     ) in ops
 
 
-def _run_cmd_put(workspace, dry_run):
+def test_determine_operations_no_duplicates(workspace):
+    repos = gwm.find_repositories(workspace, ignore=["py_cpp_pkg"])
+    # a workflow that is registered for several languages matching the same repo
+    wf = gwm.Workflow("multi", workflows_dir, ["git.yml"], ["python", "*"])
+    ops = gwm.determine_operations(repos, {"python": [wf], "*": [wf]})
+
+    assert len(ops) == 3
+    assert ops == sorted(ops)
+
+
+def _run_cmd_put(workspace, dry_run, verbose=False):
     Args = collections.namedtuple(
         "Args", ("workflows", "target_root", "ignore_repos", "dry_run", "verbose")
     )
@@ -165,7 +292,7 @@ def _run_cmd_put(workspace, dry_run):
         target_root=workspace,
         ignore_repos=["py_cpp_pkg"],
         dry_run=dry_run,
-        verbose=False,
+        verbose=verbose,
     )
     cmd_put(args)
 
@@ -204,3 +331,25 @@ def test_cmd_put(workspace):
     assert not (py_cpp_pkg / "flake8.yml").exists()
     assert not (py_cpp_pkg / "flake8-problem-matcher.json").exists()
     assert not (py_cpp_pkg / "git.yml").exists()
+
+
+def test_cmd_put_symlinked_repo(workspace, capsys):
+    (workspace / "cpp_link").symlink_to(workspace / "cpp_pkg")
+
+    def copy_lines():
+        return sorted(
+            line
+            for line in capsys.readouterr().out.splitlines()
+            if line.startswith("Copy")
+        )
+
+    _run_cmd_put(workspace, dry_run=True)
+    dry_run_ops = copy_lines()
+    _run_cmd_put(workspace, dry_run=False, verbose=True)
+    ops = copy_lines()
+
+    # the dry run lists exactly the operations that are done in the actual run
+    assert ops == dry_run_ops
+    # cpp_link is handled like a separate repository (plus empty_pkg and py_pkg)
+    assert len([line for line in ops if line.endswith("git.yml")]) == 4
+    assert (workspace / "cpp_link/.github/workflows/git.yml").exists()